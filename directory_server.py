@@ -12,25 +12,71 @@ from datetime import datetime, timezone
 # Earliest possible line after stdlib — always visible in `docker logs` (UTC ISO-8601)
 print(f"[{datetime.now(timezone.utc).isoformat()}] directory_server: process start", flush=True)
 
+import atexit
+import queue
 import traceback
+import errno
+import functools
+import hashlib
+import io
 import json
+import re
 import stat
 import threading
+import itertools
+import mimetypes
 import zipfile
-import tempfile
-from flask import Flask, jsonify, request, send_from_directory, send_file
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, abort, jsonify, make_response, request, send_file
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+from werkzeug.wsgi import ClosingIterator
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import orjson
 
 # Fixed media root (bind-mount host path in docker-compose to this path inside the container)
 MEDIA_ROOT = "/mnt/data"
 directory_toserve = MEDIA_ROOT
 
+# Media types served by the slideshow and video player (lowercase, with leading dot)
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv', '.m4v', '.3gp', '.ogv'})
+IMAGE_EXTENSIONS_TEXT = ', '.join(sorted(IMAGE_EXTENSIONS))
+VIDEO_EXTENSIONS_TEXT = ', '.join(sorted(VIDEO_EXTENSIONS))
+
+# Precompiled suffix match for filtering many names in one pass: no splitext/lower() per name.
+# \Z (not $) so a name ending in a newline does not match.
+is_image_name = re.compile(
+    r'\.(?:%s)\Z' % '|'.join(re.escape(ext[1:]) for ext in sorted(IMAGE_EXTENSIONS)),
+    re.IGNORECASE
+).search
+
+def file_extension(path):
+    """Extension of the last path component with its dot ('' if none); splitext without the generality"""
+    dot = path.rfind('.')
+    # A dot that starts the name (".hidden") is not an extension
+    if dot <= path.rfind('/') + 1:
+        return ''
+    return path[dot:]
+
 # Logging: stdout only (Docker / Portainer capture this via `docker logs`)
+# Request threads only enqueue records; a background listener thread does the stdout writes,
+# so handlers' I/O lock is never taken on the request path.
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler(sys.stdout)
+log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_listener = QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # flushes queued records, including _startup_fatal's
+
+# The listener's handler applies the full format; the queue side only merges msg % args
+log_queue_handler = QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)],
+    handlers=[log_queue_handler],
 )
 logger = logging.getLogger(__name__)
 
@@ -51,113 +97,479 @@ def _startup_fatal(message: str) -> None:
 log_level = os.environ.get('DIR_BROWSER_LOG_LEVEL', 'CRITICAL')
 numeric_level = getattr(logging, log_level.upper(), logging.CRITICAL)
 logging.getLogger().setLevel(numeric_level)
-logger.info(f"Logging set to {log_level} level")
+logger.info("Logging set to %s level", log_level)
 
 flask_debug_mode = str(os.environ.get('DIR_BROWSER_FLASK_DEBUG', 'False')).lower() in (
     'true', '1', 'yes', 'on'
 )
-logger.info(f"Flask debug mode: {flask_debug_mode}")
+logger.info("Flask debug mode: %s", flask_debug_mode)
 
-logger.info(f"Using media directory: {directory_toserve}")
+logger.info("Using media directory: %s", directory_toserve)
 if not os.path.exists(directory_toserve):
     _startup_fatal(f"Media directory does not exist: {directory_toserve}")
 
 app = Flask(__name__)
+# Also under gunicorn, which never reaches app.run() in __main__
+app.debug = flask_debug_mode
 CORS(app)  # Enable CORS for all routes
 
+# Set server start time for monitoring (also under gunicorn, which never runs __main__)
+app.start_time = time.time()
+
 # Suppress Werkzeug request logs
 import logging
 werkzeug_logger = logging.getLogger('werkzeug')
 werkzeug_logger.setLevel(getattr(logging, log_level.upper(), logging.CRITICAL))
 
+def json_bytes(obj):
+    """Serialize to JSON bytes with orjson, falling back to the stdlib for what orjson rejects"""
+    try:
+        return orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        # Names that are not valid UTF-8 come from scandir as lone surrogates ('caf\udce9.jpg');
+        # json escapes them as \udcxx so the client can send the same path back
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson (C, emits bytes), so jsonify() and request.get_json() use it"""
+
+    def dumps(self, obj, **kwargs):
+        return json_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Escaped lone surrogates (paths echoed back from a listing) only parse with the stdlib
+            return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(
+            json_bytes(self._prepare_response_obj(args, kwargs)), mimetype='application/json'
+        )
+
+app.json = OrjsonProvider(app)
+
+# Error bodies for the fixed messages are serialized once. Responses themselves are built per
+# request: after_request hooks (CORS) add headers to whatever object they are handed.
+ERROR_BODIES = {message: orjson.dumps({"error": message}) for message in (
+    "Access denied",
+    "Access denied: File outside allowed directory",
+    "Access denied: Path outside allowed directory",
+    "At least one file required",
+    "Cannot access file",
+    "Directory does not exist",
+    "Endpoint not found",
+    "File does not exist",
+    "Files list required",
+    "Internal server error",
+    "Path is a directory",
+    "Path is not a directory",
+    "Path parameter required",
+    "Permission denied",
+    "Server busy, retry later",
+)}
+
+def error_response(message, status):
+    """JSON error response, reusing the pre-serialized body when the message is a fixed one"""
+    body = ERROR_BODIES.get(message)
+    if body is None:
+        body = json_bytes({"error": message})
+    return app.response_class(body, status=status, mimetype='application/json')
+
 # Performance monitoring
-request_times = {}
-active_requests = set()
-request_lock = threading.Lock()
+# Active requests live in a fixed ring of (number, start_time, remote_addr, method, path)
+# slots indexed by the request number: one list store to start and one to finish, no dict
+# churn, no lock (next() on itertools.count and list item stores are atomic under the GIL).
+# The ring is far larger than the threads per process, so a slot is normally long free
+# before the counter wraps back to it; readers take a snapshot copy.
+ACTIVE_RING_SIZE = 4096
+active_ring = [None] * ACTIVE_RING_SIZE
+request_counter = itertools.count(1)
+
+def active_requests():
+    """Snapshot of the active request slots, oldest first"""
+    active = [slot for slot in active_ring[:] if slot is not None]
+    active.sort()
+    return active
 
 @app.before_request
 def before_request():
     """Log request start time and track active requests"""
     request.start_time = time.time()
-    request_id = f"{request.remote_addr}-{time.time()}"
-    request.request_id = request_id
+    request.request_number = next(request_counter)
+    request.ring_index = request.request_number % ACTIVE_RING_SIZE
     
-    with request_lock:
-        active_requests.add(request_id)
-        request_times[request_id] = request.start_time
+    active_ring[request.ring_index] = (request.request_number, request.start_time, request.remote_addr, request.method, request.path)
     
-    logger.info(f"Request started: {request.method} {request.path} from {request.remote_addr}")
+    logger.debug("Request started: %s %s from %s", request.method, request.path, request.remote_addr)
 
 @app.after_request
 def after_request(response):
     """Log request completion time and performance metrics"""
     if hasattr(request, 'start_time'):
         duration = time.time() - request.start_time
-        request_id = getattr(request, 'request_id', 'unknown')
-        
-        with request_lock:
-            if request_id in active_requests:
-                active_requests.remove(request_id)
-            if request_id in request_times:
-                del request_times[request_id]
+        # A request outlived by ACTIVE_RING_SIZE newer ones has lost its slot: leave the newer entry
+        slot = active_ring[request.ring_index]
+        if slot is not None and slot[0] == request.request_number:
+            active_ring[request.ring_index] = None
         
-        logger.info(f"Request completed: {request.method} {request.path} - {response.status_code} in {duration:.3f}s")
+        logger.debug("Request completed: %s %s - %s in %.3fs", request.method, request.path, response.status_code, duration)
         
         # Log slow requests
         if duration > 5.0:
-            logger.warning(f"Slow request detected: {request.method} {request.path} took {duration:.3f}s")
+            logger.warning("Slow request detected: %s %s took %.3fs", request.method, request.path, duration)
     
     return response
 
 
-def get_file_info(file_path):
-    """Get detailed information about a file or directory"""
+# Process credentials for mode-bit readability checks (avoids an access(2) per entry)
+_euid = os.geteuid()
+_egids = {os.getegid(), *os.getgroups()}
+
+def is_readable(stat_info):
+    """Check read permission from stat mode bits against the process uid/gid"""
+    if _euid == 0:
+        return True
+    if stat_info.st_uid == _euid:
+        return bool(stat_info.st_mode & stat.S_IRUSR)
+    if stat_info.st_gid in _egids:
+        return bool(stat_info.st_mode & stat.S_IRGRP)
+    return bool(stat_info.st_mode & stat.S_IROTH)
+
+def get_file_info(file_path, stat_info=None):
+    """Get detailed information about a file or directory, reusing stat_info when the caller has it"""
     try:
-        stat_info = os.stat(file_path)
+        if stat_info is None:
+            stat_info = os.stat(file_path)
         
-        # Get file type
+        # os.stat follows symlinks, so the result is either a directory or a file
         if stat.S_ISDIR(stat_info.st_mode):
             file_type = "directory"
-        elif stat.S_ISLNK(stat_info.st_mode):
-            file_type = "symlink"
-        else:
-            file_type = "file"
-        
-        # Get file size
-        if file_type == "directory":
             size = None
         else:
+            file_type = "file"
             size = stat_info.st_size
         
-        # Get permissions
-        permissions = oct(stat_info.st_mode)[-3:]
-        
-        # Get modification time
-        mtime = datetime.fromtimestamp(stat_info.st_mtime).isoformat()
-        
         return {
             "name": os.path.basename(file_path),
             "path": file_path,
             "type": file_type,
             "size": size,
-            "permissions": permissions,
-            "modified": mtime,
-            "readable": os.access(file_path, os.R_OK)
+            "permissions": stat_info.st_mode & 0o777,
+            "modified": stat_info.st_mtime,
+            "readable": is_readable(stat_info)
+        }
+    except (OSError, PermissionError) as e:
+        logger.warning("Error accessing %s: %s", file_path, e)
+        return None
+
+def get_file_info_from_entry(entry):
+    """Get detailed information about a scandir entry, reusing its cached stat"""
+    try:
+        stat_info = entry.stat()
+
+        # Directory type comes from readdir's d_type, no extra syscall
+        if entry.is_dir():
+            file_type = "directory"
+            size = None
+        else:
+            file_type = "file"
+            size = stat_info.st_size
+
+        return {
+            "name": entry.name,
+            "path": entry.path,
+            "type": file_type,
+            "size": size,
+            "permissions": stat_info.st_mode & 0o777,
+            "modified": stat_info.st_mtime,
+            "readable": is_readable(stat_info)
         }
     except (OSError, PermissionError) as e:
-        logger.warning(f"Error accessing {file_path}: {e}")
+        logger.warning("Error accessing %s: %s", entry.path, e)
         return None
 
-def is_safe_path(base_path, target_path):
-    """Check if the target path is within the base path (security check)"""
+# Stats on NAS-backed directories are latency-bound and release the GIL, so large
+# directories fan them out over a shared pool (reused across requests).
+# Env var DIR_BROWSER_STAT_WORKERS sizes the pool (stats in flight per process).
+STAT_POOL_WORKERS = max(1, int(os.environ.get('DIR_BROWSER_STAT_WORKERS', 32)))
+STAT_POOL_MIN_ENTRIES = 64
+STAT_BATCHES_PER_WORKER = 4
+stat_executor = ThreadPoolExecutor(max_workers=STAT_POOL_WORKERS, thread_name_prefix='stat')
+
+def get_image_info_from_entry(entry):
+    """Get the slideshow fields (name, path, size) of a scandir entry; None for directories"""
     try:
-        base_path = os.path.abspath(base_path)
-        target_path = os.path.abspath(target_path)
-        return target_path.startswith(base_path)
-    except:
-        return False
+        # d_type answers is_dir() without a syscall, so only files are stat'ed
+        if entry.is_dir():
+            return None
+        return {
+            "name": entry.name,
+            "path": entry.path,
+            "size": entry.stat().st_size
+        }
+    except (OSError, PermissionError) as e:
+        logger.warning("Error accessing %s: %s", entry.path, e)
+        return None
+
+def get_file_info_batch(get_info, entries):
+    """Get info for a batch of scandir entries within a single pool task"""
+    return [get_info(entry) for entry in entries]
+
+def name_sort_key(file_info):
+    """Case-insensitive sort key on the entry name"""
+    return file_info['name'].lower()
+
+def get_file_infos(entries, get_info=get_file_info_from_entry):
+    """Get file info for a list of scandir entries (None for inaccessible ones)"""
+    # One cached stat per scandir entry; serial below the threshold where pool overhead dominates
+    if len(entries) < STAT_POOL_MIN_ENTRIES:
+        return map(get_info, entries)
+    # Submit a few large batches instead of one future per entry: per-task
+    # submit/wake-up cost is paid per batch, with enough batches to balance the workers
+    batch_size = -(-len(entries) // (STAT_POOL_WORKERS * STAT_BATCHES_PER_WORKER))
+    batches = [entries[i:i + batch_size] for i in range(0, len(entries), batch_size)]
+    return itertools.chain.from_iterable(
+        stat_executor.map(functools.partial(get_file_info_batch, get_info), batches)
+    )
+
+def client_prefix(path):
+    """Root-relative prefix of a served directory ('' at the root, else 'rel/') for its entries' client paths"""
+    relative_path = os.path.relpath(path, directory_toserve)
+    return '' if relative_path == '.' else relative_path + '/'
+
+def scan_directory(path):
+    """Read a directory: file info for every entry, directories first, then files, both alphabetically"""
+    with os.scandir(path) as it:
+        entries = list(it)
+
+    # Split while collecting so the sort needs no (is_file, name) key tuple per entry
+    directories = []
+    files = []
+    # Client paths are the directory's prefix plus the entry name: one relpath per listing
+    prefix = client_prefix(path)
+    # Loop-invariant bound methods as locals (LOAD_FAST in the per-entry loop)
+    add_directory = directories.append
+    add_file = files.append
+    for file_info in get_file_infos(entries):
+        if not file_info:
+            continue
+        # Convert absolute path to relative path for client
+        file_info['path'] = prefix + file_info['name']
+        if file_info['type'] == 'directory':
+            add_directory(file_info)
+        else:
+            add_file(file_info)
+
+    directories.sort(key=name_sort_key)
+    files.sort(key=name_sort_key)
+    return directories + files
+
+def scan_images(path):
+    """Read the slideshow fields of a directory's image files, sorted by name; other entries are never stat'ed"""
+    match_image = is_image_name
+    with os.scandir(path) as it:
+        entries = [entry for entry in it if match_image(entry.name)]
+
+    prefix = client_prefix(path)
+    images = []
+    for image_info in get_file_infos(entries, get_image_info_from_entry):
+        if image_info:
+            image_info['path'] = prefix + image_info['name']
+            images.append(image_info)
+
+    images.sort(key=name_sort_key)
+    return images
+
+def iter_directory(path):
+    """Read a directory now and return its client file info in scan order, stat'ed lazily as consumed"""
+    with os.scandir(path) as it:
+        entries = list(it)
+
+    def client_entries():
+        prefix = client_prefix(path)
+        for file_info in get_file_infos(entries):
+            if file_info:
+                file_info['path'] = prefix + file_info['name']
+                yield file_info
+
+    return client_entries()
+
+# Directory listing cache: path -> ((st_mtime_ns, st_ctime_ns), cached_at, contents)
+# An entry is reused while the directory itself is unchanged and younger than the TTL;
+# the TTL bounds staleness for changes that do not touch the directory (file rewrites).
+DIR_CACHE_TTL = 5.0
+DIR_CACHE_MAX_ENTRIES = 512
+dir_cache = OrderedDict()
+dir_cache_stats = {"hits": 0, "misses": 0}
+dir_cache_lock = threading.Lock()
+
+def directory_version(path):
+    """Stat a directory and return the (st_mtime_ns, st_ctime_ns) pair its cache entry is keyed on"""
+    dir_stat = os.stat(path)
+    return (dir_stat.st_mtime_ns, dir_stat.st_ctime_ns)
+
+def get_cached_listing(path, version):
+    """Get the cached contents of a directory, or None when missing, stale or expired"""
+    now = time.time()
+    with dir_cache_lock:
+        cached = dir_cache.get(path)
+        if cached and cached[0] == version and now - cached[1] < DIR_CACHE_TTL:
+            dir_cache.move_to_end(path)
+            dir_cache_stats["hits"] += 1
+            return cached[2]
+        dir_cache_stats["misses"] += 1
+    return None
+
+def list_directory(path):
+    """Get the sorted contents of a directory, from cache when still valid"""
+    version = directory_version(path)
+    contents = get_cached_listing(path, version)
+    if contents is not None:
+        return contents
+
+    scanned_at = time.time()
+    contents = scan_directory(path)
+
+    with dir_cache_lock:
+        dir_cache[path] = (version, scanned_at, contents)
+        dir_cache.move_to_end(path)
+        while len(dir_cache) > DIR_CACHE_MAX_ENTRIES:
+            dir_cache.popitem(last=False)
+
+    return contents
+
+# Short-lived metadata cache for single-path probes (/api/image, /api/video, /api/file and
+# the existence checks): a slideshow hits the same directory dozens of times in a row.
+# path -> (cached_at, stat_result, or None for a path that does not exist)
+STAT_CACHE_TTL = 2.0
+STAT_CACHE_MAX_ENTRIES = 10000
+stat_cache = OrderedDict()
+stat_cache_lock = threading.Lock()
+
+def cached_stat(path):
+    """os.stat() memoized for STAT_CACHE_TTL seconds; missing paths are remembered too"""
+    now = time.time()
+    with stat_cache_lock:
+        cached = stat_cache.get(path)
+        if cached and now - cached[0] < STAT_CACHE_TTL:
+            stat_cache.move_to_end(path)
+        else:
+            cached = None
+
+    if cached is None:
+        try:
+            stat_info = os.stat(path)
+        except FileNotFoundError:
+            stat_info = None
+        with stat_cache_lock:
+            stat_cache[path] = (now, stat_info)
+            stat_cache.move_to_end(path)
+            while len(stat_cache) > STAT_CACHE_MAX_ENTRIES:
+                stat_cache.popitem(last=False)
+    else:
+        stat_info = cached[1]
+
+    if stat_info is None:
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+    return stat_info
+
+def cached_exists(path):
+    """Return (exists, is_dir, is_file) for a path from one cached stat"""
+    try:
+        mode = cached_stat(path).st_mode
+    except (OSError, ValueError):
+        return False, False, False
+    return True, stat.S_ISDIR(mode), stat.S_ISREG(mode)
+
+def stat_regular_file(path):
+    """Get the cached stat of a regular file, or None when the path is missing or not a file"""
+    try:
+        stat_info = cached_stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return stat_info if stat.S_ISREG(stat_info.st_mode) else None
+
+def invalidate_cached_stat(path):
+    """Drop a path from this process's stat cache (other gunicorn workers keep theirs until the TTL)"""
+    with stat_cache_lock:
+        stat_cache.pop(path, None)
+
+# Cap concurrent listing/archive work so bursts of clients do not swamp the NAS;
+# requests that cannot get a slot in time get 503 + Retry-After instead of piling up
+NAS_MAX_CONCURRENT = 16
+NAS_ACQUIRE_TIMEOUT = 10.0
+NAS_RETRY_AFTER = 5
+nas_semaphore = threading.BoundedSemaphore(NAS_MAX_CONCURRENT)
+
+def nas_limited(view):
+    """Run a view while holding one of the NAS concurrency slots"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not nas_semaphore.acquire(timeout=NAS_ACQUIRE_TIMEOUT):
+            logger.warning("NAS busy, rejecting %s %s", request.method, request.path)
+            response = error_response("Server busy, retry later", 503)
+            response.headers['Retry-After'] = str(NAS_RETRY_AFTER)
+            return response
+        try:
+            response = view(*args, **kwargs)
+        except BaseException:
+            nas_semaphore.release()
+            raise
+        # Generator bodies keep reading the NAS after the view returns: hold the slot until the
+        # server closes the body. In-memory and passthrough bodies (send_file) release now:
+        # a passthrough body goes to the server unwrapped, so Response.close() never runs.
+        if isinstance(response, Response) and response.is_streamed and not response.direct_passthrough:
+            response.response = ClosingIterator(response.response, nas_semaphore.release)
+        else:
+            nas_semaphore.release()
+        return response
+    return wrapper
+
+# Served root resolved once at startup; the separator suffix keeps /mnt/data2 from matching /mnt/data
+SAFE_ROOT = os.path.abspath(directory_toserve)
+SAFE_ROOT_PREFIX = SAFE_ROOT.rstrip(os.sep) + os.sep
+
+def is_safe_path(target_path):
+    """Check if a normalized absolute path is within the served directory (security check)"""
+    return target_path == SAFE_ROOT or target_path.startswith(SAFE_ROOT_PREFIX)
+
+def resolve_client_path(relative_path):
+    """Convert a client (root-relative) path to an absolute server path, or None when it escapes the root"""
+    if not relative_path:
+        return directory_toserve
+    # Validate the client string itself, before anything is joined or stat'ed: no NUL bytes
+    # (os.stat would raise ValueError), no '..' segments, and no '.' or empty segments, which
+    # also rules out absolute paths ('/etc' splits into '', 'etc'). With the trailing '/'
+    # dropped, every directory has one spelling and one cache entry. The prefix check stays
+    # as a cheap backstop.
+    relative_path = relative_path.rstrip('/')
+    if '\x00' in relative_path:
+        return None
+    parts = relative_path.split('/')
+    if '..' in parts or '.' in parts or '' in parts:
+        return None
+    path = os.path.join(directory_toserve, relative_path)
+    return path if is_safe_path(path) else None
+
+def directory_location(path):
+    """Get the client paths (relative, parent) of a served directory; parent is None at the root"""
+    if path == directory_toserve:
+        return "", None
+    relative_path = os.path.relpath(path, directory_toserve)
+    if relative_path == '.':
+        relative_path = ""
+    parent_abs = os.path.dirname(path)
+    parent_path = ""
+    if parent_abs != directory_toserve:
+        parent_path = os.path.relpath(parent_abs, directory_toserve)
+        if parent_path == '.':
+            parent_path = ""
+    return relative_path, parent_path
 
 @app.route('/api/directory', methods=['GET'])
+@nas_limited
 def get_directory_contents():
     """Get contents of a directory"""
     try:
@@ -165,63 +577,37 @@ def get_directory_contents():
         relative_path = request.args.get('path', '')
         
         # Convert relative path back to absolute for server operations
-        if relative_path:
-            path = os.path.join(directory_toserve, relative_path)
-        else:
-            path = directory_toserve
+        path = resolve_client_path(relative_path)
         
         # Debug logging
-        logger.info(f"Directory request - Requested relative path: {relative_path}, Server root: {directory_toserve}")
-        logger.info(f"Path exists: {os.path.exists(path)}, Is directory: {os.path.isdir(path) if os.path.exists(path) else 'N/A'}")
+        logger.debug("Directory request - Requested relative path: %s, Server root: %s", relative_path, directory_toserve)
         
         # Security check - ensure path is within allowed directory
-        if not is_safe_path(directory_toserve, path):
-            logger.warning(f"Security check failed - Requested: {path}, Allowed root: {directory_toserve}")
-            return jsonify({"error": "Access denied: Path outside allowed directory"}), 403
+        if path is None:
+            logger.warning("Security check failed - Requested: %s, Allowed root: %s", relative_path, directory_toserve)
+            return error_response("Access denied: Path outside allowed directory", 403)
         
-        # Check if path exists and is a directory
-        if not os.path.exists(path):
-            return jsonify({"error": "Directory does not exist"}), 404
+        # Check if path exists and is a directory (one cached stat)
+        path_exists, path_is_dir, _ = cached_exists(path)
+        logger.debug("Path exists: %s, Is directory: %s", path_exists, path_is_dir if path_exists else 'N/A')
+        if not path_exists:
+            return error_response("Directory does not exist", 404)
         
-        if not os.path.isdir(path):
-            return jsonify({"error": "Path is not a directory"}), 400
+        if not path_is_dir:
+            return error_response("Path is not a directory", 400)
         
-        # Get directory contents
+        # Get directory contents (cached while the directory is unchanged)
         try:
-            items = os.listdir(path)
+            contents = list_directory(path)
         except PermissionError:
-            return jsonify({"error": "Permission denied"}), 403
-        
-        # Get detailed info for each item
-        contents = []
-        for item in items:
-            item_path = os.path.join(path, item)
-            file_info = get_file_info(item_path)
-            if file_info:
-                # Convert absolute path to relative path for client
-                if file_info['path'].startswith(directory_toserve):
-                    file_info['path'] = os.path.relpath(file_info['path'], directory_toserve)
-                    if not file_info['path'] or file_info['path'] == '.':
-                        file_info['path'] = ''
-                contents.append(file_info)
-        
-        # Sort contents: directories first, then files, both alphabetically
-        contents.sort(key=lambda x: (x['type'] != 'directory', x['name'].lower()))
+            return error_response("Permission denied", 403)
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached existence check (possibly by another worker)
+            invalidate_cached_stat(path)
+            return error_response("Directory does not exist", 404)
         
         # Convert paths to relative for client
-        relative_path = os.path.relpath(path, directory_toserve) if path != directory_toserve else ""
-        if relative_path == '.':
-            relative_path = ""
-        
-        parent_path = None
-        if path != directory_toserve:
-            parent_abs = os.path.dirname(path)
-            if parent_abs != directory_toserve:
-                parent_path = os.path.relpath(parent_abs, directory_toserve)
-                if parent_path == '.':
-                    parent_path = ""
-            else:
-                parent_path = ""
+        relative_path, parent_path = directory_location(path)
         
         return jsonify({
             "path": relative_path,
@@ -232,8 +618,81 @@ def get_directory_contents():
         })
         
     except Exception as e:
-        logger.error(f"Error in get_directory_contents: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error in get_directory_contents: %s", e)
+        return error_response("Internal server error", 500)
+
+# Lines per chunk of a streamed listing: early first bytes without one socket write per entry
+NDJSON_BATCH_LINES = 64
+
+def generate_ndjson_listing(contents, relative_path, parent_path):
+    """Yield a listing as NDJSON chunks: one line per entry, then a trailer line with the totals"""
+    dumps = json_bytes
+    lines = []
+    total_items = 0
+    try:
+        for file_info in contents:
+            lines.append(dumps(file_info))
+            total_items += 1
+            if len(lines) == NDJSON_BATCH_LINES:
+                lines.append(b"")
+                yield b"\n".join(lines)
+                lines = []
+        lines.append(dumps({
+            "path": relative_path,
+            "parent": parent_path,
+            "root_path": "",
+            "total_items": total_items
+        }))
+        lines.append(b"")
+        yield b"\n".join(lines)
+    except Exception as e:
+        # Headers are already sent; the missing trailer line tells the client the listing is incomplete
+        logger.error("Error streaming directory %s: %s", relative_path, e)
+
+@app.route('/api/directory/stream', methods=['GET'])
+@nas_limited
+def stream_directory_contents():
+    """Stream contents of a directory as NDJSON (entry lines, then a trailer with path/parent/total_items)"""
+    try:
+        relative_path = request.args.get('path', '')
+        
+        # Convert relative path back to absolute for server operations
+        path = resolve_client_path(relative_path)
+        
+        # Security check - ensure path is within allowed directory
+        if path is None:
+            logger.warning("Security check failed - Requested: %s, Allowed root: %s", relative_path, directory_toserve)
+            return error_response("Access denied: Path outside allowed directory", 403)
+        
+        path_exists, path_is_dir, _ = cached_exists(path)
+        if not path_exists:
+            return error_response("Directory does not exist", 404)
+        
+        if not path_is_dir:
+            return error_response("Path is not a directory", 400)
+        
+        # A valid cached listing streams sorted; otherwise entries stream unsorted as their
+        # stats complete. The directory is read before the response starts so errors keep their status.
+        try:
+            contents = get_cached_listing(path, directory_version(path))
+            if contents is None:
+                contents = iter_directory(path)
+        except PermissionError:
+            return error_response("Permission denied", 403)
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached existence check (possibly by another worker)
+            invalidate_cached_stat(path)
+            return error_response("Directory does not exist", 404)
+        
+        relative_path, parent_path = directory_location(path)
+        return Response(
+            generate_ndjson_listing(contents, relative_path, parent_path),
+            mimetype='application/x-ndjson'
+        )
+        
+    except Exception as e:
+        logger.error("Error in stream_directory_contents: %s", e)
+        return error_response("Internal server error", 500)
 
 @app.route('/api/file', methods=['GET'])
 def get_file_contents():
@@ -241,32 +700,28 @@ def get_file_contents():
     try:
         relative_path = request.args.get('path')
         if not relative_path:
-            return jsonify({"error": "Path parameter required"}), 400
+            return error_response("Path parameter required", 400)
         
         # Convert relative path back to absolute for server operations
-        if relative_path:
-            path = os.path.join(directory_toserve, relative_path)
-        else:
-            path = directory_toserve
+        path = resolve_client_path(relative_path)
         
         # Security check
-        if not is_safe_path(directory_toserve, path):
-            return jsonify({"error": "Access denied"}), 403
-        
-        if not os.path.exists(path):
-            return jsonify({"error": "File does not exist"}), 404
+        if path is None:
+            return error_response("Access denied", 403)
         
-        if os.path.isdir(path):
-            return jsonify({"error": "Path is a directory"}), 400
+        # One stat answers exists/isdir and feeds the file info
+        try:
+            stat_info = cached_stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return error_response("File does not exist", 404)
         
-        # Check if file is readable
-        if not os.access(path, os.R_OK):
-            return jsonify({"error": "Permission denied"}), 403
+        if stat.S_ISDIR(stat_info.st_mode):
+            return error_response("Path is a directory", 400)
         
         # Get file info
-        file_info = get_file_info(path)
+        file_info = get_file_info(path, stat_info)
         if not file_info:
-            return jsonify({"error": "Cannot access file"}), 500
+            return error_response("Cannot access file", 500)
         
         # For small text files, return content
         max_size = 1024 * 1024  # 1MB limit
@@ -277,66 +732,92 @@ def get_file_contents():
             }), 413
         
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # raw=1: the file itself as text/plain, through the sendfile-capable file wrapper
+            # (size re-checked on the opened file: it may have grown since the cached stat)
+            if request.args.get('raw', '').lower() in ('true', '1', 'yes', 'on'):
+                response = send_media_file(path, mimetype='text/plain', max_age=TEXT_CACHE_MAX_AGE, max_size=max_size)
+                if response is None:
+                    return jsonify({
+                        "error": "File too large to display",
+                        "file_info": file_info
+                    }), 413
+                return response
+            
+            # One bounded binary read: a file that grew since the stat still cannot exceed the limit
+            with open(path, 'rb') as f:
+                data = f.read(max_size + 1)
+            if len(data) > max_size:
+                return jsonify({
+                    "error": "File too large to display",
+                    "file_info": file_info
+                }), 413
             return jsonify({
                 "file_info": file_info,
-                "content": content
+                "content": data.decode('utf-8')
             })
         except UnicodeDecodeError:
             return jsonify({
                 "error": "File is not a text file",
                 "file_info": file_info
             }), 400
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached stat (possibly by another worker)
+            invalidate_cached_stat(path)
+            return error_response("File does not exist", 404)
         
+    except PermissionError:
+        # No access(2) pre-check: open() reports EACCES itself
+        return error_response("Permission denied", 403)
     except Exception as e:
-        logger.error(f"Error in get_file_contents: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error in get_file_contents: %s", e)
+        return error_response("Internal server error", 500)
 
 
 
 @app.route('/api/slideshow', methods=['GET'])
+@nas_limited
 def get_slideshow_images():
     """Get all JPG images in a directory for slideshow"""
     try:
         relative_path = request.args.get('path')
         if relative_path is None:
-            return jsonify({"error": "Path parameter required"}), 400
+            return error_response("Path parameter required", 400)
         
         # Convert relative path back to absolute for server operations
-        if relative_path:
-            path = os.path.join(directory_toserve, relative_path)
-        else:
-            path = directory_toserve
+        path = resolve_client_path(relative_path)
         
-        if not is_safe_path(directory_toserve, path):
-            return jsonify({"error": "Access denied"}), 403
+        if path is None:
+            return error_response("Access denied", 403)
         
-        if not os.path.exists(path) or not os.path.isdir(path):
-            return jsonify({"error": "Directory does not exist"}), 404
+        path_exists, path_is_dir, _ = cached_exists(path)
+        if not path_exists or not path_is_dir:
+            return error_response("Directory does not exist", 404)
         
         # Find all image files in the directory
         image_files = []
-        allowed_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif')
         try:
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                if os.path.isfile(item_path):
-                    # Check if file is an image (case insensitive)
-                    if item.lower().endswith(allowed_extensions):
-                        file_info = get_file_info(item_path)
-                        if file_info:
-                            # Convert absolute path to relative path for client
-                            if file_info['path'].startswith(directory_toserve):
-                                file_info['path'] = os.path.relpath(file_info['path'], directory_toserve)
-                                if not file_info['path'] or file_info['path'] == '.':
-                                    file_info['path'] = ''
-                            image_files.append(file_info)
+            # Reuse a cached listing (files there are already sorted by name); otherwise
+            # scan for images only, so non-image entries cost no stat at all
+            contents = get_cached_listing(path, directory_version(path))
+            if contents is None:
+                image_files = scan_images(path)
+            else:
+                match_image = is_image_name
+                add_image = image_files.append
+                for file_info in contents:
+                    # Check if file is an image (case insensitive); the client only needs the slideshow fields
+                    if file_info['type'] == 'file' and match_image(file_info['name']):
+                        add_image({
+                            "name": file_info['name'],
+                            "path": file_info['path'],
+                            "size": file_info['size']
+                        })
         except PermissionError:
-            return jsonify({"error": "Permission denied"}), 403
-        
-        # Sort files by name
-        image_files.sort(key=lambda x: x['name'].lower())
+            return error_response("Permission denied", 403)
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached existence check (possibly by another worker)
+            invalidate_cached_stat(path)
+            return error_response("Directory does not exist", 404)
         
         # Convert path to relative for client
         relative_path = os.path.relpath(path, directory_toserve) if path != directory_toserve else ""
@@ -350,110 +831,192 @@ def get_slideshow_images():
         })
         
     except Exception as e:
-        logger.error(f"Error in get_slideshow_images: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error in get_slideshow_images: %s", e)
+        return error_response("Internal server error", 500)
+
 
 
+# Client page kept in memory: no stat/open/read per hit, and a content-hash ETag turns reloads into 304s
+INDEX_FILE = os.path.join(app.root_path, 'directory_client.html')
+index_page = None  # (st_mtime_ns, body, etag)
+
+def load_index_page():
+    """Read the client page into memory"""
+    global index_page
+    with open(INDEX_FILE, 'rb') as f:
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        body = f.read()
+    index_page = (mtime_ns, body, hashlib.sha1(body).hexdigest())
+    return index_page
+
+try:
+    load_index_page()
+except OSError as e:
+    logger.warning("Cannot preload %s: %s", INDEX_FILE, e)
 
 @app.route('/')
 def index():
     """Serve the main HTML page"""
-    return send_from_directory('.', 'directory_client.html')
+    try:
+        page = index_page
+        # In debug mode pick up edits to the client without a restart
+        if page is None or (flask_debug_mode and os.stat(INDEX_FILE).st_mtime_ns != page[0]):
+            page = load_index_page()
+    except OSError:
+        abort(404)
+
+    response = make_response(page[1])
+    response.content_type = 'text/html; charset=utf-8'
+    response.set_etag(page[2])
+    return response.make_conditional(request)
 
 @app.route('/api/health')
 def health_check():
     """Health check endpoint with server status"""
     try:
-        with request_lock:
-            active_count = len(active_requests)
-            oldest_request = min(request_times.values()) if request_times else None
-            oldest_age = time.time() - oldest_request if oldest_request else 0
+        active = active_requests()
+        active_count = len(active)
+        oldest_request = active[0][1] if active else None
+        oldest_age = time.time() - oldest_request if oldest_request else 0
         
         return jsonify({
             "status": "healthy",
             "active_requests": active_count,
             "oldest_request_age": f"{oldest_age:.2f}s" if oldest_age else None,
+            "nas_slots_available": nas_semaphore._value,
+            "nas_slots_total": NAS_MAX_CONCURRENT,
             "server_uptime": f"{time.time() - app.start_time:.2f}s" if hasattr(app, 'start_time') else "unknown"
         })
     except Exception as e:
-        logger.error(f"Health check error: {e}")
+        logger.error("Health check error: %s", e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @app.route('/api/debug/requests')
 def debug_requests():
     """Debug endpoint to show active requests"""
     try:
-        with request_lock:
-            active_requests_list = list(active_requests)
-            request_details = []
-            for req_id in active_requests_list:
-                start_time = request_times.get(req_id, 0)
-                age = time.time() - start_time
-                request_details.append({
-                    "id": req_id,
-                    "age": f"{age:.2f}s"
-                })
+        active_requests_list = active_requests()
+
+        # Request ids are only formatted here, not on every request
+        now = time.time()
+        request_details = [
+            {"id": f"{remote_addr}-{number}", "method": method, "path": path, "age": f"{now - start_time:.2f}s"}
+            for number, start_time, remote_addr, method, path in active_requests_list
+        ]
         
         return jsonify({
             "active_requests": request_details,
             "total_active": len(active_requests_list)
         })
     except Exception as e:
-        logger.error(f"Debug requests error: {e}")
+        logger.error("Debug requests error: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/debug/cache')
+def debug_cache():
+    """Debug endpoint to show directory listing cache state"""
+    try:
+        now = time.time()
+        with dir_cache_lock:
+            entries = [
+                {
+                    "path": os.path.relpath(path, directory_toserve),
+                    "items": len(cached[2]),
+                    "age": f"{now - cached[1]:.2f}s"
+                }
+                for path, cached in dir_cache.items()
+            ]
+            stats = dict(dir_cache_stats)
+
+        return jsonify({
+            "entries": entries,
+            "total_entries": len(entries),
+            "max_entries": DIR_CACHE_MAX_ENTRIES,
+            "ttl": DIR_CACHE_TTL,
+            "hits": stats["hits"],
+            "misses": stats["misses"]
+        })
+    except Exception as e:
+        logger.error("Debug cache error: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# Media files rarely change in place; let browsers reuse them across slideshow loops
+MEDIA_CACHE_MAX_AGE = 3600
+# Text files are more likely to be edited in place
+TEXT_CACHE_MAX_AGE = 60
+
+def send_media_file(path, mimetype=None, max_age=MEDIA_CACHE_MAX_AGE, max_size=None):
+    """Send a media file with ETag/Last-Modified validators, public caching and Range support;
+    None (nothing sent) when the opened file is larger than max_size"""
+    # Hand send_file an open file rather than a path: send_from_directory/send_file would
+    # walk the path and stat it again. The file goes through wsgi.file_wrapper, which
+    # gunicorn serves with sendfile(2).
+    media_file = open(path, 'rb')
+    try:
+        # Length and validators must describe the bytes actually sent: fstat the open file
+        # (no path walk) rather than trust the caller's possibly cached stat
+        stat_info = os.fstat(media_file.fileno())
+        if max_size is not None and stat_info.st_size > max_size:
+            media_file.close()
+            return None
+        response = send_file(
+            media_file,
+            mimetype=mimetype,
+            download_name=os.path.basename(path),
+            conditional=False,
+            etag=f"{stat_info.st_ino}-{stat_info.st_mtime_ns}-{stat_info.st_size}",
+            last_modified=stat_info.st_mtime,
+            max_age=max_age
+        )
+    except BaseException:
+        media_file.close()
+        raise
+    response.content_length = stat_info.st_size
+    return response.make_conditional(request, accept_ranges=True, complete_length=stat_info.st_size)
+
 @app.route('/api/image/<path:filepath>')
 def serve_image(filepath):
     """Serve image files for slideshow"""
     try:
         # The filepath is already relative from the server root
         # Convert relative path back to absolute for server operations
-        if filepath:
-            full_path = os.path.join(directory_toserve, filepath)
-        else:
-            full_path = directory_toserve
+        full_path = resolve_client_path(filepath)
         
-        logger.debug(f"Serving image: {filepath} -> {full_path}")
+        logger.debug("Serving image: %s -> %s", filepath, full_path)
         
         # Security check
-        if not is_safe_path(directory_toserve, full_path):
-            logger.warning(f"Access denied for image: {full_path}")
-            return jsonify({"error": "Access denied"}), 403
-        
-        if not os.path.exists(full_path) or not os.path.isfile(full_path):
-            logger.warning(f"Image file not found: {full_path}")
-            return jsonify({"error": "File does not exist"}), 404
-        
-        # Check if file is readable
-        if not os.access(full_path, os.R_OK):
-            logger.warning(f"Permission denied for image: {full_path}")
-            return jsonify({"error": "Permission denied"}), 403
-        
-        # Check if it's an image file
-        allowed_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif')
-        if not filepath.lower().endswith(allowed_extensions):
-            logger.warning(f"Not an image file: {filepath} (allowed: {allowed_extensions})")
-            return jsonify({"error": f"Not an image file. Allowed extensions: {', '.join(allowed_extensions)}"}), 400
-        
-        # Get file size for logging
-        try:
-            file_size = os.path.getsize(full_path)
-            logger.debug(f"Serving image: {filepath} ({file_size} bytes)")
-        except OSError:
-            file_size = "unknown"
+        if full_path is None:
+            logger.warning("Access denied for image: %s", filepath)
+            return error_response("Access denied", 403)
         
-        # Get directory and filename for send_from_directory
-        directory_path = os.path.dirname(full_path)
-        filename = os.path.basename(full_path)
+        # Check if it's an image file (string check, before touching the filesystem)
+        extension = file_extension(filepath).lower()
+        if extension not in IMAGE_EXTENSIONS:
+            logger.warning("Not an image file: %s (allowed: %s)", filepath, IMAGE_EXTENSIONS_TEXT)
+            return error_response(f"Not an image file. Allowed extensions: {IMAGE_EXTENSIONS_TEXT}", 400)
         
-        # Add more detailed logging for debugging
-        logger.info(f"Successfully serving image: {filename} from {directory_path}")
+        # Cached stat: existence and type gate. No readability pre-check: open() reports EACCES
+        # itself and also honours ACLs; headers come from the opened file
+        stat_info = stat_regular_file(full_path)
+        if stat_info is None:
+            logger.warning("Image file not found: %s", full_path)
+            return error_response("File does not exist", 404)
+        logger.debug("Serving image: %s (%s bytes)", full_path, stat_info.st_size)
         
-        return send_from_directory(directory_path, filename)
+        try:
+            return send_media_file(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached stat (possibly by another worker)
+            invalidate_cached_stat(full_path)
+            logger.warning("Image file not found: %s", full_path)
+            return error_response("File does not exist", 404)
         
+    except PermissionError:
+        logger.warning("Permission denied for image: %s", filepath)
+        return error_response("Permission denied", 403)
     except Exception as e:
-        logger.error(f"Error serving image {filepath}: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error serving image %s: %s", filepath, e)
+        return error_response("Internal server error", 500)
 
 @app.route('/api/video')
 def serve_video():
@@ -461,140 +1024,206 @@ def serve_video():
     try:
         relative_path = request.args.get('path')
         if not relative_path:
-            return jsonify({"error": "Path parameter required"}), 400
+            return error_response("Path parameter required", 400)
         
         # Convert relative path back to absolute for server operations
-        if relative_path:
-            path = os.path.join(directory_toserve, relative_path)
-        else:
-            path = directory_toserve
+        path = resolve_client_path(relative_path)
         
         # Security check
-        if not is_safe_path(directory_toserve, path):
-            logger.warning(f"Access denied for video: {path}")
-            return jsonify({"error": "Access denied"}), 403
-        
-        if not os.path.exists(path) or not os.path.isfile(path):
-            logger.warning(f"Video file not found: {path}")
-            return jsonify({"error": "File does not exist"}), 404
-        
-        # Check if file is readable
-        if not os.access(path, os.R_OK):
-            logger.warning(f"Permission denied for video: {path}")
-            return jsonify({"error": "Permission denied"}), 403
-        
-        # Check if it's a video file
-        allowed_extensions = ('.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv', '.m4v', '.3gp', '.ogv')
-        if not path.lower().endswith(allowed_extensions):
-            logger.warning(f"Not a video file: {path} (allowed: {allowed_extensions})")
-            return jsonify({"error": f"Not a video file. Allowed extensions: {', '.join(allowed_extensions)}"}), 400
-        
-        # Get directory and filename
-        directory_path = os.path.dirname(path)
-        filename = os.path.basename(path)
-        
-        # Get file size for logging
-        try:
-            file_size = os.path.getsize(path)
-            logger.debug(f"Serving video: {filename} ({file_size} bytes)")
-        except OSError:
-            file_size = "unknown"
+        if path is None:
+            logger.warning("Access denied for video: %s", relative_path)
+            return error_response("Access denied", 403)
         
-        logger.info(f"Successfully serving video: {filename} from {directory_path}")
+        # Check if it's a video file (string check, before touching the filesystem)
+        extension = file_extension(path).lower()
+        if extension not in VIDEO_EXTENSIONS:
+            logger.warning("Not a video file: %s (allowed: %s)", path, VIDEO_EXTENSIONS_TEXT)
+            return error_response(f"Not a video file. Allowed extensions: {VIDEO_EXTENSIONS_TEXT}", 400)
         
-        return send_from_directory(directory_path, filename)
+        # Cached stat: existence and type gate. No readability pre-check: open() reports EACCES
+        # itself and also honours ACLs; headers come from the opened file
+        stat_info = stat_regular_file(path)
+        if stat_info is None:
+            logger.warning("Video file not found: %s", path)
+            return error_response("File does not exist", 404)
+        
+        logger.debug("Serving video: %s (%s bytes)", path, stat_info.st_size)
+        
+        # An explicit video mimetype lets browsers issue Range requests for seeking
+        try:
+            return send_media_file(path, mimetype=mimetypes.guess_type(path)[0])
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since the cached stat (possibly by another worker)
+            invalidate_cached_stat(path)
+            logger.warning("Video file not found: %s", path)
+            return error_response("File does not exist", 404)
         
+    except PermissionError:
+        logger.warning("Permission denied for video: %s", request.args.get('path'))
+        return error_response("Permission denied", 403)
     except Exception as e:
-        logger.error(f"Error serving video: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error serving video: %s", e)
+        return error_response("Internal server error", 500)
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+# Already-compressed formats: deflating them costs CPU for ~0 gain. Uncompressed
+# images (.bmp, .tif/.tiff) are left out so they still get deflated.
+STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.heic', '.avif',
+    '.mp3', '.m4a', '.aac', '.ogg', '.flac',
+    '.zip', '.gz', '.bz2', '.xz', '.7z', '.rar',
+}) | VIDEO_EXTENSIONS
+ZIP_STREAM_CHUNK_SIZE = 1024 * 1024
+ZIP_IN_MEMORY_LIMIT = 64 * 1024 * 1024
+
+class ZipStreamBuffer:
+    """Unseekable write-only file object collecting ZipFile output until it is drained"""
+
+    def __init__(self):
+        self.chunks = deque()
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Yield and discard everything written so far"""
+        while self.chunks:
+            yield self.chunks.popleft()
+
+def zip_info_from_stat(arcname, stat_info):
+    """Build the ZipInfo that ZipInfo.from_file would, from a stat the caller already has"""
+    date_time = time.localtime(stat_info.st_mtime)[:6]
+    # ZIP timestamps cannot predate 1980
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    zip_info = zipfile.ZipInfo(arcname, date_time)
+    zip_info.external_attr = (stat_info.st_mode & 0xFFFF) << 16
+    zip_info.file_size = stat_info.st_size
+    return zip_info
+
+def generate_favorites_zip(favorite_files):
+    """Build the favorites ZIP from (path, stat) pairs, yielding archive bytes as they are produced"""
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        file_mapping = {}
+        file_counter = 1
+
+        for file_path, file_stat in favorite_files:
+            # Get relative path from server root
+            rel_path = os.path.relpath(file_path, directory_toserve)
+
+            # Create new filename with 4-digit counter
+            extension = file_extension(rel_path)
+            new_filename = f"{file_counter:04d}{extension}"
+
+            try:
+                source = open(file_path, 'rb')
+            except OSError as e:
+                logger.warning("File not found or not accessible: %s (%s)", file_path, e)
+                continue
+
+            # Add file to ZIP with new name, copying in chunks so each one can be sent
+            zip_info = zip_info_from_stat(new_filename, file_stat)
+            if extension.lower() in STORED_EXTENSIONS:
+                zip_info.compress_type = zipfile.ZIP_STORED
+            else:
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+            with source, zip_file.open(zip_info, 'w') as dest:
+                while True:
+                    chunk = source.read(ZIP_STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield from buffer.drain()
+
+            # Store mapping
+            file_mapping[new_filename] = {
+                "original_path": rel_path,
+                "original_name": os.path.basename(rel_path),
+                "file_number": file_counter
+            }
+
+            logger.debug("Added to ZIP: %s -> %s", rel_path, new_filename)
+            file_counter += 1
+            yield from buffer.drain()
+
+        # Add JSON mapping file to ZIP
+        mapping_json = json.dumps(file_mapping, indent=2)
+        zip_file.writestr("file_mapping.json", mapping_json)
+        logger.debug("Added file_mapping.json to ZIP")
+
+    # Central directory is written when the ZipFile closes
+    yield from buffer.drain()
 
 @app.route('/api/download-favorites', methods=['POST'])
+@nas_limited
 def download_favorites():
     """Download multiple files as a ZIP archive"""
     try:
         data = request.get_json()
         if not data or 'files' not in data:
-            return jsonify({"error": "Files list required"}), 400
+            return error_response("Files list required", 400)
         
         files = data['files']
         if not isinstance(files, list) or len(files) == 0:
-            return jsonify({"error": "At least one file required"}), 400
+            return error_response("At least one file required", 400)
         
         # Convert relative paths back to absolute for server operations
         absolute_files = []
         for file_path in files:
-            if file_path:
-                absolute_path = os.path.join(directory_toserve, file_path)
-            else:
-                absolute_path = directory_toserve
+            absolute_path = resolve_client_path(file_path)
             
             # Security check - ensure all files are within allowed directory
-            if not is_safe_path(directory_toserve, absolute_path):
-                logger.warning(f"Access denied for file in favorites download: {absolute_path}")
-                return jsonify({"error": "Access denied: File outside allowed directory"}), 403
+            if absolute_path is None:
+                logger.warning("Access denied for file in favorites download: %s", file_path)
+                return error_response("Access denied: File outside allowed directory", 403)
             
             absolute_files.append(absolute_path)
         
-        # Create temporary ZIP file
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.zip')
-        os.close(temp_fd)
-        
-        try:
-            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                file_mapping = {}
-                file_counter = 1
-                
-                for file_path in absolute_files:
-                    if os.path.exists(file_path) and os.path.isfile(file_path):
-                        # Get relative path from server root
-                        rel_path = os.path.relpath(file_path, directory_toserve)
-                        
-                        # Create new filename with 4-digit counter
-                        file_extension = os.path.splitext(rel_path)[1]
-                        new_filename = f"{file_counter:04d}{file_extension}"
-                        
-                        # Add file to ZIP with new name
-                        zip_file.write(file_path, new_filename)
-                        
-                        # Store mapping
-                        file_mapping[new_filename] = {
-                            "original_path": rel_path,
-                            "original_name": os.path.basename(rel_path),
-                            "file_number": file_counter
-                        }
-                        
-                        logger.info(f"Added to ZIP: {rel_path} -> {new_filename}")
-                        file_counter += 1
-                    else:
-                        logger.warning(f"File not found or not accessible: {file_path}")
-                
-                # Add JSON mapping file to ZIP
-                mapping_json = json.dumps(file_mapping, indent=2)
-                zip_file.writestr("file_mapping.json", mapping_json)
-                logger.info("Added file_mapping.json to ZIP")
-            
-            # Send the ZIP file
+        download_name = f'favorites-{datetime.now().strftime("%Y%m%d-%H%M%S")}.zip'
+
+        # One stat per favorite: it filters out missing and non-regular files, sizes the
+        # archive and supplies the ZIP entry metadata
+        favorite_files = []
+        total_size = 0
+        for file_path in absolute_files:
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                file_stat = None
+            if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+                logger.warning("File not found or not accessible: %s", file_path)
+                continue
+            favorite_files.append((file_path, file_stat))
+            total_size += file_stat.st_size
+
+        # Small sets: build the whole archive in memory (no disk I/O, and the client gets a Content-Length)
+        if total_size < ZIP_IN_MEMORY_LIMIT:
+            archive = io.BytesIO()
+            for chunk in generate_favorites_zip(favorite_files):
+                archive.write(chunk)
+            archive.seek(0)
             return send_file(
-                temp_path,
+                archive,
                 as_attachment=True,
-                download_name=f'favorites-{datetime.now().strftime("%Y%m%d-%H%M%S")}.zip',
+                download_name=download_name,
                 mimetype='application/zip'
             )
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_path)
-            except OSError:
-                pass
-                
+
+        # Large sets: stream the ZIP as it is built, first bytes leave after the first chunk
+        return Response(
+            generate_favorites_zip(favorite_files),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
+        )
+
     except Exception as e:
-        logger.error(f"Error in download_favorites: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error in download_favorites: %s", e)
+        return error_response("Internal server error", 500)
 
 
 @app.route('/api/delete-favorites', methods=['POST'])
@@ -603,43 +1232,40 @@ def delete_favorites():
     try:
         data = request.get_json()
         if not data or 'files' not in data:
-            return jsonify({"error": "Files list required"}), 400
+            return error_response("Files list required", 400)
 
         files = data['files']
         if not isinstance(files, list) or len(files) == 0:
-            return jsonify({"error": "At least one file required"}), 400
+            return error_response("At least one file required", 400)
 
         deleted = []
         errors = []
 
         for rel_path in files:
             try:
-                if rel_path:
-                    absolute_path = os.path.join(directory_toserve, rel_path)
-                else:
-                    absolute_path = directory_toserve
-
-                if not is_safe_path(directory_toserve, absolute_path):
-                    msg = f"Access denied for delete: {absolute_path}"
-                    logger.warning(msg)
+                absolute_path = resolve_client_path(rel_path)
+
+                if absolute_path is None:
+                    logger.warning("Access denied for delete: %s", rel_path)
                     errors.append({"path": rel_path, "error": "Access denied"})
                     continue
 
                 if not os.path.exists(absolute_path):
-                    logger.warning(f"File not found for delete: {absolute_path}")
+                    logger.warning("File not found for delete: %s", absolute_path)
                     errors.append({"path": rel_path, "error": "File not found"})
                     continue
 
                 if not os.path.isfile(absolute_path):
-                    logger.warning(f"Not a file for delete: {absolute_path}")
+                    logger.warning("Not a file for delete: %s", absolute_path)
                     errors.append({"path": rel_path, "error": "Not a file"})
                     continue
 
                 os.remove(absolute_path)
-                logger.info(f"Deleted favorite file: {absolute_path}")
+                invalidate_cached_stat(absolute_path)
+                logger.info("Deleted favorite file: %s", absolute_path)
                 deleted.append(rel_path)
             except Exception as file_error:
-                logger.error(f"Error deleting favorite file {rel_path}: {file_error}")
+                logger.error("Error deleting favorite file %s: %s", rel_path, file_error)
                 errors.append({"path": rel_path, "error": "Delete failed"})
 
         message_parts = []
@@ -655,25 +1281,25 @@ def delete_favorites():
         }), 200
 
     except Exception as e:
-        logger.error(f"Error in delete_favorites: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        logger.error("Error in delete_favorites: %s", e)
+        return error_response("Internal server error", 500)
 
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({"error": "Endpoint not found"}), 404
+    return error_response("Endpoint not found", 404)
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({"error": "Internal server error"}), 500
+    return error_response("Internal server error", 500)
 
 if __name__ == "__main__":
-    # Set server start time for monitoring
-    app.start_time = time.time()
-
-    logger.info(f"Starting directory server with root path: {directory_toserve}")
+    # Development server only; in production run under gunicorn:
+    #   gunicorn -c gunicorn.conf.py directory_server:app
+    logger.info("Starting directory server with root path: %s", directory_toserve)
     logger.info("Debug endpoints available:")
     logger.info("  - GET /api/health - Server health check")
     logger.info("  - GET /api/debug/requests - Show active requests")
+    logger.info("  - GET /api/debug/cache - Show directory listing cache")
 
     try:
         # Never use the Werkzeug reloader in Docker: the parent exits with code 0 and PID 1
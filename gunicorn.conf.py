@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the Directory Browser API Server
+Start with: gunicorn -c gunicorn.conf.py directory_server:app
+"""
+
+import os
+
+# Env var names:
+# - DIR_BROWSER_WORKERS: worker processes (default: 2)
+# - DIR_BROWSER_THREADS: threads per worker (default: 32)
+bind = "0.0.0.0:5000"
+
+# Pooled worker threads instead of the dev server's thread per request. Requests mostly
+# block on NAS I/O (GIL released), so threads overlap well; keep the process count low
+# because the listing/stat caches, stat pool and NAS semaphore are per process.
+worker_class = "gthread"
+workers = int(os.environ.get('DIR_BROWSER_WORKERS', 2))
+threads = int(os.environ.get('DIR_BROWSER_THREADS', 32))
+
+# Browsers reuse connections for slideshow image fetches
+keepalive = 30
+
+# Media responses go through wsgi.file_wrapper; let the kernel copy them with sendfile(2)
+sendfile = True
@@ -3,6 +3,7 @@ set -x
 
 cp directory_server.py ~/nasdocker/dir-browser/directory_server.py
 cp directory_client.html ~/nasdocker/dir-browser/directory_client.html
+cp gunicorn.conf.py ~/nasdocker/dir-browser/gunicorn.conf.py
 cp requirements.txt ~/nasdocker/dir-browser/requirements.txt
 cp nginx.conf ~/nasdocker/dir-browser/nginx.conf
 cp .dockerignore ~/nasdocker/dir-browser/.dockerignore
@@ -0,0 +1,53 @@
+"""
+Tests for the Directory Browser API Server
+Run with: python -m unittest test_directory_server
+Needs the media root (/mnt/data) to exist and be writable; test files go in a temporary folder there.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+MEDIA_ROOT = "/mnt/data"
+
+if not (os.path.isdir(MEDIA_ROOT) and os.access(MEDIA_ROOT, os.W_OK)):
+    raise unittest.SkipTest(f"{MEDIA_ROOT} must exist and be writable")
+
+import directory_server
+
+
+class FavoritesDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=MEDIA_ROOT)
+        self.addCleanup(shutil.rmtree, self.folder)
+        name = os.path.basename(self.folder)
+        for filename in ('a.jpg', 'b.txt'):
+            with open(os.path.join(self.folder, filename), 'wb') as f:
+                f.write(b'x' * 100)
+        self.files = [f"{name}/a.jpg", f"{name}/b.txt"]
+        self.client = directory_server.app.test_client()
+
+    def download(self):
+        response = self.client.post('/api/download-favorites', json={'files': self.files})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data.startswith(b'PK'))
+        return response
+
+    def test_in_memory_zip_releases_nas_slot(self):
+        response = self.download()
+        response.close()
+        self.assertEqual(directory_server.nas_semaphore._value, directory_server.NAS_MAX_CONCURRENT)
+
+    def test_streamed_zip_releases_nas_slot_when_closed(self):
+        with mock.patch.object(directory_server, 'ZIP_IN_MEMORY_LIMIT', 0):
+            response = self.download()
+        # The generator body holds its slot until the server closes it
+        self.assertEqual(directory_server.nas_semaphore._value, directory_server.NAS_MAX_CONCURRENT - 1)
+        response.close()
+        self.assertEqual(directory_server.nas_semaphore._value, directory_server.NAS_MAX_CONCURRENT)
+
+
+if __name__ == '__main__':
+    unittest.main()